@@ -0,0 +1,21 @@
+from django.http import HttpResponseNotFound
+
+# Browser/crawler probes the app never serves.
+SHORT_CIRCUIT_PATHS = frozenset({
+    "/favicon.ico",
+    "/robots.txt",
+    "/apple-touch-icon.png",
+    "/apple-touch-icon-precomposed.png",
+})
+
+
+class PathShortCircuitMiddleware:
+    """Answer known-missing paths with a bare 404 before the rest of the chain runs."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.path in SHORT_CIRCUIT_PATHS:
+            return HttpResponseNotFound()
+        return self.get_response(request)
@@ -1,14 +1,10 @@
 from django.contrib import admin
-from django.shortcuts import redirect
 from django.urls import include, path
-
-
-def root_redirect(_request):
-    return redirect("/schedule/")
+from django.views.generic.base import RedirectView
 
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("schedule/", include("scheduling.urls")),
-    path("", root_redirect),
+    path("", RedirectView.as_view(url="/schedule/", permanent=True)),
 ]
@@ -7,6 +7,9 @@ from .models import ScheduleTheme, ScheduleWeek, Slot, Staff
 class StaffAdmin(admin.ModelAdmin):
     list_display = ("name", "created_at")
     search_fields = ("name",)
+    show_full_result_count = False
+    ordering = ("name",)
+    list_per_page = 50
 
 
 @admin.register(Slot)
@@ -17,15 +20,37 @@ class SlotAdmin(admin.ModelAdmin):
     list_display = ("label", "sort_order", "key", "allow_block", "bg_type")
     list_display_links = ("label",)
     list_editable = ("sort_order",)
-    search_fields = ("label", "key")
+    search_fields = ("^label", "=key")
+    show_full_result_count = False
+    ordering = ("sort_order", "id")
+    list_per_page = 50
+
+    def save_model(self, request, obj, form, change):
+        # Inline sort_order edits only touch that column; don't rewrite the whole row.
+        if change and form.changed_data:
+            obj.save(update_fields=form.changed_data)
+            return
+        super().save_model(request, obj, form, change)
 
 
 @admin.register(ScheduleWeek)
 class ScheduleWeekAdmin(admin.ModelAdmin):
     list_display = ("week_start", "created_at", "updated_at")
     search_fields = ("week_start",)
+    show_full_result_count = False
+    ordering = ("-week_start",)
+    save_on_top = True
+
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        # The changelist only shows dates, so skip loading the cells JSON per row.
+        match = request.resolver_match
+        if match and match.url_name and match.url_name.endswith("_changelist"):
+            qs = qs.defer("cells", "notes")
+        return qs
 
 
 @admin.register(ScheduleTheme)
 class ScheduleThemeAdmin(admin.ModelAdmin):
     list_display = ("id", "header_bg_type", "updated_at")
+    show_full_result_count = False
@@ -8,5 +8,7 @@ DAYS = [
     ("sun", "Sun"),
 ]
 
-EXCLUSIVE_SLOT_KEYS = {"off_day", "ph_al"}
+VALID_DAY_KEYS = frozenset(k for k, _ in DAYS)
+
+EXCLUSIVE_SLOT_KEYS = frozenset({"off_day", "ph_al"})
 PT_SLOT_KEY = "pt"
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-15 05:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduling', '0003_alter_scheduletheme_created_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='slot',
+            name='sort_order',
+            field=models.IntegerField(db_index=True, default=0),
+        ),
+    ]
@@ -4,14 +4,32 @@ from datetime import timedelta
 
 from django.db import models
 from django.utils import timezone
+from django.utils.functional import cached_property
 
 from .constants import DAYS
 
+_DAY_INDEX = {k: i for i, (k, _) in enumerate(DAYS)}
+
 
 def _now():
     return timezone.now()
 
 
+def coerce_staff_ids(raw) -> list[int]:
+    # A cell's "staff" as plain ints: legacy digit strings are converted, anything
+    # else dropped. Same ids as [int(x) for x in raw if str(x).isdigit()].
+    if not isinstance(raw, (list, tuple)):
+        return []
+    ids = []
+    for x in raw:
+        if type(x) is int:
+            if x >= 0:
+                ids.append(x)
+        elif isinstance(x, str) and x.isdigit():
+            ids.append(int(x))
+    return ids
+
+
 def _title_case(s: str) -> str:
     s = (s or "").strip()
     if not s:
@@ -40,7 +58,7 @@ class Slot(models.Model):
 
     key = models.SlugField(max_length=40, unique=True)
     label = models.CharField(max_length=40)
-    sort_order = models.IntegerField(default=0)
+    sort_order = models.IntegerField(default=0, db_index=True)
 
     allow_block = models.BooleanField(default=False)  # only PT uses this
 
@@ -58,6 +76,13 @@ class Slot(models.Model):
     def __str__(self):
         return f"{self.sort_order} - {self.label}"
 
+    @cached_property
+    def style_css(self) -> str:
+        # Inline style for the slot's row label in the week editor.
+        if self.bg_type == self.BG_GRADIENT:
+            return f"background-image: linear-gradient(90deg, {self.bg_color1}, {self.bg_color2}); color: {self.text_color};"
+        return f"background-color: {self.bg_color1}; color: {self.text_color};"
+
 
 class ScheduleTheme(models.Model):
     BG_SOLID = "solid"
@@ -104,27 +129,37 @@ class ScheduleWeek(models.Model):
         return self.week_start + timedelta(days=6)
 
     def date_for_day_key(self, day_key: str):
-        idx = [k for k, _ in DAYS].index(day_key)
-        return self.week_start + timedelta(days=idx)
+        return self.week_start + timedelta(days=_DAY_INDEX[day_key])
 
-    def ensure_defaults(self, *, slots: list[Slot]):
+    def ensure_defaults(self, *, slots: list[Slot]) -> bool:
+        """Fill in missing slot/day cells; return True if ``cells`` changed."""
+        dirty = False
         if not isinstance(self.cells, dict):
             self.cells = {}
+            dirty = True
 
         for slot in slots:
-            if slot.key not in self.cells or not isinstance(self.cells.get(slot.key), dict):
-                self.cells[slot.key] = {}
+            day_map = self.cells.get(slot.key)
+            if not isinstance(day_map, dict):
+                day_map = self.cells[slot.key] = {}
+                dirty = True
 
             for day_key, _ in DAYS:
-                cell = self.cells[slot.key].get(day_key)
+                cell = day_map.get(day_key)
                 if not isinstance(cell, dict):
-                    cell = {}
-
-                cell.setdefault("staff", [])
-                cell.setdefault("blocked", False)
-                if slot.key == "pt":
-                    cell.setdefault("pt_time", slot.pt_default_time or "7-11")
-
-                self.cells[slot.key][day_key] = cell
-
-        return self.cells
+                    cell = day_map[day_key] = {}
+                    dirty = True
+
+                staff = cell.get("staff")
+                ids = coerce_staff_ids(staff)
+                if ids != staff:
+                    cell["staff"] = ids
+                    dirty = True
+                if "blocked" not in cell:
+                    cell["blocked"] = False
+                    dirty = True
+                if slot.key == "pt" and "pt_time" not in cell:
+                    cell["pt_time"] = slot.pt_default_time or "7-11"
+                    dirty = True
+
+        return dirty
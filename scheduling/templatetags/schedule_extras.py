@@ -45,13 +45,3 @@ def get_str(d, key):
             return ""
         return str(v)
     return ""
-
-
-@register.filter
-def style_bg(slot):
-    try:
-        if getattr(slot, "bg_type", "") == "gradient":
-            return f"background-image: linear-gradient(90deg, {slot.bg_color1}, {slot.bg_color2}); color: {slot.text_color};"
-        return f"background-color: {slot.bg_color1}; color: {slot.text_color};"
-    except Exception:
-        return ""
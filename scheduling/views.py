@@ -3,13 +3,15 @@ from __future__ import annotations
 import json
 from datetime import datetime, timedelta
 
-from django.http import HttpResponse, JsonResponse
+from django.db import transaction
+from django.http import Http404, HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils import timezone
 from django.views.decorators.http import require_POST
 
-from .constants import DAYS, EXCLUSIVE_SLOT_KEYS, PT_SLOT_KEY
-from .exports import build_pdf, build_png
-from .models import ScheduleTheme, ScheduleWeek, Slot, Staff
+from .constants import DAYS, EXCLUSIVE_SLOT_KEYS, PT_SLOT_KEY, VALID_DAY_KEYS
+from .exports import build_pdf, build_png, png_output_dpi
+from .models import ScheduleTheme, ScheduleWeek, Slot, Staff, coerce_staff_ids
 
 
 def _monday(d):
@@ -24,21 +26,31 @@ def _json_body(request):
 
 
 def _unique_keep_order(items):
-    seen = set()
-    out = []
-    for x in items:
-        if x in seen:
-            continue
-        seen.add(x)
-        out.append(x)
-    return out
+    # dicts keep insertion order, so this dedupes without a Python-level loop.
+    return list(dict.fromkeys(items))
 
 
 def _get_theme():
-    theme = ScheduleTheme.objects.order_by("id").first()
-    if not theme:
-        theme = ScheduleTheme.objects.create()
-    return theme
+    # The seed migration creates id=1; get_or_create keeps concurrent first
+    # requests on an empty table from inserting two themes.
+    return ScheduleTheme.objects.order_by("id").first() or ScheduleTheme.objects.get_or_create(pk=1)[0]
+
+
+def _all_slots():
+    # Ordered slot list, shared by the editor, the cell APIs and exports.
+    return list(Slot.objects.order_by("sort_order", "label"))
+
+
+def _slots_with(slot_key: str):
+    """Return (ordered slots, the slot with ``slot_key``), or raise Http404.
+
+    One query serves both the lookup and ensure_defaults.
+    """
+    slots = _all_slots()
+    slot = next((s for s in slots if s.key == slot_key), None)
+    if slot is None:
+        raise Http404("No Slot matches the given query.")
+    return slots, slot
 
 
 def home(request):
@@ -49,7 +61,8 @@ def home(request):
         ScheduleWeek.objects.get_or_create(week_start=monday)
         return redirect("scheduling:week_editor", week_start=monday.isoformat())
 
-    weeks = ScheduleWeek.objects.order_by("-week_start")[:40]
+    # The list only shows dates (week_end derives from week_start); skip cells/notes.
+    weeks = ScheduleWeek.objects.only("id", "week_start").order_by("-week_start")[:40]
     today = datetime.now().date().isoformat()
     return render(request, "scheduling/home.html", {
         "weeks": weeks,
@@ -84,28 +97,33 @@ def staff_page(request):
 def staff_delete(request, staff_id: int):
     staff = get_object_or_404(Staff, id=staff_id)
 
-    # Remove from all weeks
-    for sched in ScheduleWeek.objects.all():
+    # Remove from all weeks. Only weeks whose JSON mentions the id can hold it
+    # (the text match is a superset, e.g. 1 also matches 12); the exact check
+    # is below. Changed weeks are written back in one bulk UPDATE.
+    changed_weeks = []
+    for sched in ScheduleWeek.objects.only("id", "cells").filter(cells__icontains=str(staff.id)):
         if not isinstance(sched.cells, dict):
             continue
         changed = False
-        for slot_key, day_map in (sched.cells or {}).items():
+        for day_map in sched.cells.values():
             if not isinstance(day_map, dict):
                 continue
-            for day_key in list(day_map.keys()):
-                cell = day_map.get(day_key) or {}
+            for cell in day_map.values():
                 if not isinstance(cell, dict):
                     continue
-                ids = [int(x) for x in (cell.get("staff") or []) if str(x).isdigit()]
+                ids = coerce_staff_ids(cell.get("staff"))
                 new_ids = [x for x in ids if x != staff.id]
                 if new_ids != ids:
                     cell["staff"] = new_ids
-                    sched.cells[slot_key][day_key] = cell
                     changed = True
         if changed:
-            sched.save()
+            sched.updated_at = timezone.now()
+            changed_weeks.append(sched)
 
-    staff.delete()
+    with transaction.atomic():
+        if changed_weeks:
+            ScheduleWeek.objects.bulk_update(changed_weeks, ["cells", "updated_at"], batch_size=500)
+        staff.delete()
     return redirect("scheduling:staff")
 
 
@@ -204,9 +222,9 @@ def week_editor(request, week_start: str):
     week_start_date = _monday(datetime.strptime(week_start, "%Y-%m-%d").date())
     schedule, _ = ScheduleWeek.objects.get_or_create(week_start=week_start_date)
 
-    slots = list(Slot.objects.order_by("sort_order", "label"))
-    schedule.ensure_defaults(slots=slots)
-    schedule.save()
+    slots = _all_slots()
+    if schedule.ensure_defaults(slots=slots):
+        schedule.save()
 
     if request.method == "POST" and request.POST.get("save_notes"):
         schedule.notes = (request.POST.get("notes") or "").strip()
@@ -246,8 +264,7 @@ def _is_staff_assigned_anywhere(schedule: ScheduleWeek, *, day_key: str, staff_i
         if slot_key in EXCLUSIVE_SLOT_KEYS:
             continue
         cell = (day_map or {}).get(day_key, {}) or {}
-        ids = [int(x) for x in (cell.get("staff") or []) if str(x).isdigit()]
-        if staff_id in ids:
+        if staff_id in coerce_staff_ids(cell.get("staff")):
             return True
     return False
 
@@ -255,12 +272,27 @@ def _is_staff_assigned_anywhere(schedule: ScheduleWeek, *, day_key: str, staff_i
 def _is_staff_in_exclusive(schedule: ScheduleWeek, *, day_key: str, staff_id: int) -> bool:
     for ex_key in EXCLUSIVE_SLOT_KEYS:
         cell = (schedule.cells.get(ex_key, {}) or {}).get(day_key, {}) or {}
-        ids = [int(x) for x in (cell.get("staff") or []) if str(x).isdigit()]
-        if staff_id in ids:
+        if staff_id in coerce_staff_ids(cell.get("staff")):
             return True
     return False
 
 
+def _ensure_cell(schedule: ScheduleWeek, *, slots, slot_key: str, day_key: str) -> None:
+    # Fill in the whole grid only when the target cell is missing; an existing
+    # cell still gets its staff ids as ints (legacy rows stored digit strings).
+    day_map = schedule.cells.get(slot_key) if isinstance(schedule.cells, dict) else None
+    if not isinstance(day_map, dict) or not isinstance(day_map.get(day_key), dict):
+        schedule.ensure_defaults(slots=slots)
+    else:
+        cell = day_map[day_key]
+        cell["staff"] = coerce_staff_ids(cell.get("staff"))
+
+
+def _save_cells(schedule: ScheduleWeek) -> None:
+    # The cell APIs only change cells: one narrow UPDATE instead of a full save().
+    ScheduleWeek.objects.filter(pk=schedule.pk).update(cells=schedule.cells, updated_at=timezone.now())
+
+
 @require_POST
 def api_cell_update(request, week_start: str):
     week_start_date = _monday(datetime.strptime(week_start, "%Y-%m-%d").date())
@@ -274,13 +306,12 @@ def api_cell_update(request, week_start: str):
     staff_id = payload.get("staff_id")
     pt_time = payload.get("pt_time")
 
-    slot = get_object_or_404(Slot, key=slot_key)
+    slots, slot = _slots_with(slot_key)
 
-    valid_day_keys = {k for k, _ in DAYS}
-    if day_key not in valid_day_keys:
+    if day_key not in VALID_DAY_KEYS:
         return JsonResponse({"ok": False, "error": "Invalid day."}, status=400)
 
-    schedule.ensure_defaults(slots=list(Slot.objects.order_by("sort_order", "label")))
+    _ensure_cell(schedule, slots=slots, slot_key=slot_key, day_key=day_key)
 
     cell = schedule.cells[slot_key][day_key]
 
@@ -292,7 +323,7 @@ def api_cell_update(request, week_start: str):
             return JsonResponse({"ok": False, "error": "PT time only applies to PT row."}, status=400)
         cell["pt_time"] = (pt_time or "").strip()
         schedule.cells[slot_key][day_key] = cell
-        schedule.save()
+        _save_cells(schedule)
         return JsonResponse({"ok": True, "staff_ids": cell.get("staff") or [], "pt_time": cell.get("pt_time") or "", "blocked": bool(cell.get("blocked"))})
 
     if staff_id is None:
@@ -306,7 +337,7 @@ def api_cell_update(request, week_start: str):
     if not Staff.objects.filter(id=staff_id).exists():
         return JsonResponse({"ok": False, "error": "Staff not found."}, status=404)
 
-    ids = [int(x) for x in (cell.get("staff") or []) if str(x).isdigit()]
+    ids = list(cell.get("staff") or [])
     ids = _unique_keep_order(ids)
 
     if action == "add":
@@ -319,31 +350,35 @@ def api_cell_update(request, week_start: str):
             if _is_staff_assigned_anywhere(schedule, day_key=day_key, staff_id=staff_id):
                 return JsonResponse({"ok": False, "error": "Not allowed: staff already assigned on this day."}, status=409)
 
-        if staff_id not in ids:
+        # Only write when this add actually changes something.
+        dirty = staff_id not in ids
+        if dirty:
             ids.append(staff_id)
         cell["staff"] = ids
         schedule.cells[slot_key][day_key] = cell
 
         # If adding to exclusive row, remove from all other rows that day
         if slot_key in EXCLUSIVE_SLOT_KEYS:
-            for other_slot_key, day_map in (schedule.cells or {}).items():
-                if other_slot_key == slot_key:
+            for other_slot_key, day_map in schedule.cells.items():
+                if other_slot_key == slot_key or not isinstance(day_map, dict):
                     continue
-                other_cell = (day_map or {}).get(day_key, {}) or {}
-                other_ids = [int(x) for x in (other_cell.get("staff") or []) if str(x).isdigit()]
-                new_other = [x for x in other_ids if x != staff_id]
-                if new_other != other_ids:
-                    other_cell["staff"] = new_other
-                    schedule.cells[other_slot_key][day_key] = other_cell
+                other_cell = day_map.get(day_key)
+                if not other_cell:
+                    continue
+                other_ids = coerce_staff_ids(other_cell.get("staff"))
+                if staff_id in other_ids:
+                    other_cell["staff"] = [x for x in other_ids if x != staff_id]
+                    dirty = True
 
-        schedule.save()
+        if dirty:
+            _save_cells(schedule)
         return JsonResponse({"ok": True, "staff_ids": cell.get("staff") or [], "pt_time": cell.get("pt_time") or "", "blocked": bool(cell.get("blocked"))})
 
     if action == "remove":
         new_ids = [x for x in ids if x != staff_id]
         cell["staff"] = new_ids
         schedule.cells[slot_key][day_key] = cell
-        schedule.save()
+        _save_cells(schedule)
         return JsonResponse({"ok": True, "staff_ids": cell.get("staff") or [], "pt_time": cell.get("pt_time") or "", "blocked": bool(cell.get("blocked"))})
 
     return JsonResponse({"ok": False, "error": "Invalid action."}, status=400)
@@ -358,11 +393,11 @@ def api_cell_block(request, week_start: str):
     slot_key = (payload.get("slot_key") or "").strip()
     day_key = (payload.get("day_key") or "").strip()
 
-    slot = get_object_or_404(Slot, key=slot_key)
+    slots, slot = _slots_with(slot_key)
     if not slot.allow_block:
         return JsonResponse({"ok": False, "error": "This slot cannot be blocked."}, status=400)
 
-    schedule.ensure_defaults(slots=list(Slot.objects.order_by("sort_order", "label")))
+    _ensure_cell(schedule, slots=slots, slot_key=slot_key, day_key=day_key)
 
     cell = schedule.cells[slot_key][day_key]
     blocked = not bool(cell.get("blocked"))
@@ -370,7 +405,7 @@ def api_cell_block(request, week_start: str):
     if blocked:
         cell["staff"] = []
     schedule.cells[slot_key][day_key] = cell
-    schedule.save()
+    _save_cells(schedule)
 
     return JsonResponse({"ok": True, "staff_ids": cell.get("staff") or [], "pt_time": cell.get("pt_time") or "", "blocked": bool(cell.get("blocked"))})
 
@@ -380,10 +415,10 @@ def week_pdf(request, week_start: str):
     week_start_date = _monday(datetime.strptime(week_start, "%Y-%m-%d").date())
     schedule = get_object_or_404(ScheduleWeek, week_start=week_start_date)
 
-    slots = list(Slot.objects.order_by("sort_order", "label"))
+    slots = _all_slots()
     schedule.ensure_defaults(slots=slots)
 
-    staff_map = {s.id: s.name for s in Staff.objects.all()}
+    staff_map = dict(Staff.objects.values_list("id", "name"))
     style = int(request.GET.get("style") or 1)
     pdf_bytes = build_pdf(schedule=schedule, slots=slots, staff_map=staff_map, theme=theme, style=style)
 
@@ -397,15 +432,26 @@ def week_png(request, week_start: str):
     week_start_date = _monday(datetime.strptime(week_start, "%Y-%m-%d").date())
     schedule = get_object_or_404(ScheduleWeek, week_start=week_start_date)
 
-    slots = list(Slot.objects.order_by("sort_order", "label"))
+    slots = _all_slots()
     schedule.ensure_defaults(slots=slots)
 
-    staff_map = {s.id: s.name for s in Staff.objects.all()}
+    staff_map = dict(Staff.objects.values_list("id", "name"))
     dpi = int(request.GET.get("dpi") or 450)
     style = int(request.GET.get("style") or 1)
-
-    png_bytes = build_png(schedule=schedule, slots=slots, staff_map=staff_map, theme=theme, dpi=dpi, style=style)
+    width = int(request.GET.get("width") or 0) or None
+
+    png_bytes = build_png(
+        schedule=schedule,
+        slots=slots,
+        staff_map=staff_map,
+        theme=theme,
+        dpi=dpi,
+        style=style,
+        target_px_w=width,
+    )
 
     resp = HttpResponse(png_bytes, content_type="image/png")
-    resp["Content-Disposition"] = f'attachment; filename="schedule_{schedule.week_start}_{dpi}dpi.png"'
+    # Name the file after the dpi actually rendered (clamped / width-capped).
+    out_dpi = png_output_dpi(dpi, target_px_w=width)
+    resp["Content-Disposition"] = f'attachment; filename="schedule_{schedule.week_start}_{out_dpi}dpi.png"'
     return resp